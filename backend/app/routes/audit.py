@@ -10,45 +10,89 @@ from .. import supabase # Import the initialized Supabase client
 # Create Blueprint
 audit_bp = Blueprint("audit", __name__, url_prefix="/api/audit-logs")
 
+# Full projection keeps the old_values/new_values change contents -
+# consumers inspecting what changed rely on them. Clients that only
+# render the log list (they dominate row size) can pass
+# ?include_values=false to drop them.
+AUDIT_COLUMNS = (
+    "id, user_id, action, table_name, record_id, old_values, new_values, "
+    "timestamp, ip_address"
+)
+AUDIT_COLUMNS_SLIM = (
+    "id, user_id, action, table_name, record_id, timestamp, ip_address"
+)
+
+# Allowed query-string filters: param -> (builder op, column). Keeping
+# this explicit means clients can never filter on arbitrary columns.
+AUDIT_FILTERS = {
+    "user_id": ("eq", "user_id"),
+    "action": ("eq", "action"),
+    "table_name": ("eq", "table_name"),
+    "record_id": ("eq", "record_id"),
+    "start_date": ("gte", "timestamp"),  # e.g., 2023-10-27T00:00:00Z
+    "end_date": ("lte", "timestamp"),    # e.g., 2023-10-28T00:00:00Z
+}
+
 
 # == Audit Logs ==
 @audit_bp.route("", methods=["GET"])
 @token_required
 @roles_required("admin")
 def get_audit_logs():
-    """Admin: View audit log entries with filtering."""
+    """Admin: View audit log entries with filtering.
+
+    Pagination is keyset-based: pass ?before=<iso-timestamp>&
+    before_id=<uuid>&limit=20 from the returned next_cursor. OFFSET
+    scans and discards every skipped row, so deep pages get linearly
+    slower; seeking on the indexed timestamp keeps every page O(limit).
+    The cursor is compound (timestamp, id) because trigger-written and
+    batch-flushed entries routinely share a timestamp, and a
+    timestamp-only seek would skip the rest of a boundary group. The
+    old ?page= offset form still works for existing clients but is
+    deprecated.
+    """
     try:
         page = request.args.get("page", default=1, type=int)
         limit = request.args.get("limit", default=20, type=int)
-        offset = (page - 1) * limit
-
-        # Start query with count
-        query = supabase.table("audit_logs").select("*", count="exact")
-
-        # Filtering
-        user_filter = request.args.get("user_id")
-        action_filter = request.args.get("action")
-        start_date = request.args.get("start_date") # e.g., 2023-10-27T00:00:00Z
-        end_date = request.args.get("end_date")     # e.g., 2023-10-28T00:00:00Z
-        table_filter = request.args.get("table_name")
-        record_filter = request.args.get("record_id")
-
-        if user_filter:
-            query = query.eq("user_id", user_filter)
-        if action_filter:
-            query = query.eq("action", action_filter)
-        if start_date:
-            query = query.gte("timestamp", start_date)
-        if end_date:
-            query = query.lte("timestamp", end_date)
-        if table_filter:
-            query = query.eq("table_name", table_filter)
-        if record_filter:
-            query = query.eq("record_id", record_filter)
-
-
-        # Apply ordering and pagination *after* filtering
-        query = query.order("timestamp", desc=True).range(offset, offset + limit - 1)
+        before = request.args.get("before")
+        before_id = request.args.get("before_id")
+        include_values = (
+            request.args.get("include_values", default="true").lower()
+            != "false"
+        )
+
+        # count=estimated reads the planner statistics instead of running
+        # a full COUNT(*) over the table on every page load; the log view
+        # only uses it for a rough total.
+        query = supabase.table("audit_logs").select(
+            AUDIT_COLUMNS if include_values else AUDIT_COLUMNS_SLIM,
+            count="estimated",
+        )
+
+        # Filtering, driven by the AUDIT_FILTERS table above
+        for param, (op, column) in AUDIT_FILTERS.items():
+            value = request.args.get(param)
+            if value:
+                query = getattr(query, op)(column, value)
+
+        # Apply ordering and pagination *after* filtering. id breaks ties
+        # so rows sharing a timestamp have a total order to seek over.
+        query = query.order("timestamp", desc=True).order("id", desc=True)
+        if before:
+            # Keyset: seek past the cursor instead of counting rows off
+            if before_id:
+                query = query.or_(
+                    f"timestamp.lt.{before},"
+                    f"and(timestamp.eq.{before},id.lt.{before_id})"
+                )
+            else:
+                # Timestamp-only cursor from an older client
+                query = query.lt("timestamp", before)
+            query = query.limit(limit)
+        else:
+            # Deprecated offset path, kept for existing clients
+            offset = (page - 1) * limit
+            query = query.range(offset, offset + limit - 1)
 
         result = query.execute()
 
@@ -56,7 +100,16 @@ def get_audit_logs():
         # if hasattr(result, 'error') and result.error:
         #     raise Exception(f"Error fetching audit logs: {result.error}")
 
-        return jsonify({"data": result.data, "count": result.count})
+        last = result.data[-1] if result.data else None
+        next_cursor = (
+            {"timestamp": last["timestamp"], "id": last["id"]}
+            if last else None
+        )
+        return jsonify({
+            "data": result.data,
+            "count": result.count,
+            "next_cursor": next_cursor,
+        })
     except Exception as e:
         logging.error(f"Error fetching audit logs: {e}")
         abort(500, description="Failed to retrieve audit logs.")
@@ -1,13 +1,42 @@
 # backend/app/routes/items.py
 import io
 import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pandas as pd
-from flask import Blueprint, jsonify, request, abort, g
-import uuid # Import uuid
+from cachetools import TTLCache
+from flask import (
+    Blueprint,
+    Response,
+    jsonify,
+    request,
+    abort,
+    g,
+    stream_with_context,
+)
+
+# pyarrow's SIMD CSV reader parses uploads several times faster than
+# pandas' tokenizer and can read the upload stream directly (no BytesIO
+# copy). Fall back to pandas when it isn't installed.
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:
+    pa = None
+    pacsv = None
 
 # Import decorators, helpers, and supabase client
 from ..utils.auth import token_required, roles_required
-from ..utils.helpers import log_audit, LOW_STOCK_THRESHOLD
+from ..utils.cache import invalidate_response_cache
+from ..utils.helpers import log_audit, LOW_STOCK_THRESHOLD, json_dumps
+from ..utils.validation import (
+    ITEM_CREATE_SPEC,
+    ITEM_UPDATE_SPEC,
+    ITEM_QUANTITY_SPEC,
+    validate_payload,
+)
 from .. import supabase # Import the initialized Supabase client
 
 # Create Blueprint
@@ -15,6 +44,36 @@ from .. import supabase # Import the initialized Supabase client
 items_bp = Blueprint("items", __name__, url_prefix="/api/items")
 
 
+# Bulk quantity updates go to the database in slices of this many rows so
+# a huge CSV can't produce an oversized request body
+_BULK_RPC_CHUNK = 1000
+
+# --- Item Read Cache ---
+# Hot item reads are answered from process memory instead of paying an
+# HTTPS round-trip per view. Staleness is bounded by a short TTL, and the
+# mutating endpoints below invalidate eagerly so a writer always sees its
+# own change. (Cross-process invalidation via Postgres LISTEN/NOTIFY was
+# considered, but this backend has no direct database connection - all
+# traffic goes through PostgREST - so the TTL is the cross-worker bound.)
+_ITEM_CACHE_TTL = 30
+_item_cache = TTLCache(maxsize=10000, ttl=_ITEM_CACHE_TTL)
+_item_cache_lock = threading.Lock()
+
+
+def _invalidate_item_cache(item_id):
+    """Drop a single item from the read cache (call after writes)."""
+    with _item_cache_lock:
+        _item_cache.pop(str(item_id), None)
+
+
+# UUID shape check for bulk CSV rows. A precompiled regex applied with
+# pandas' vectorized string matcher runs as one C loop over the column,
+# instead of N rounds of uuid.UUID() exception machinery.
+_UUID_RE = re.compile(
+    r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}", re.I
+)
+
+
 # == Inventory Items ==
 @items_bp.route("", methods=["POST"]) # Route is now relative to blueprint prefix
 @token_required
@@ -22,18 +81,21 @@ items_bp = Blueprint("items", __name__, url_prefix="/api/items")
 def add_item():
     """Admin: Add a new item to inventory."""
     data = request.get_json()
-    if not data or not all(k in data for k in ("name", "quantity", "price")):
+    clean, missing, invalid = validate_payload(data, ITEM_CREATE_SPEC)
+    if missing:
         abort(400, description="Missing required fields: name, quantity, price")
+    if invalid:
+        if any("negative" in problem for problem in invalid):
+            abort(400, description="Quantity and price cannot be negative.")
+        abort(400, description=f"Invalid data format: {'; '.join(invalid)}")
 
     try:
         new_item = {
-            "name": data["name"],
-            "quantity": int(data["quantity"]),
-            "price": float(data["price"]),
-            "category": data.get("category"), # Optional
+            "name": clean["name"],
+            "quantity": clean["quantity"],
+            "price": clean["price"],
+            "category": clean.get("category"), # Optional
         }
-        if new_item["quantity"] < 0 or new_item["price"] < 0:
-            abort(400, description="Quantity and price cannot be negative.")
 
         result = supabase.table("items").insert(new_item).execute()
 
@@ -44,6 +106,7 @@ def add_item():
             abort(500, description="Failed to save item to database.")
 
         created_item = result.data[0]
+        invalidate_response_cache()
         log_audit(
             action="CREATE_ITEM",
             table_name="items",
@@ -63,11 +126,40 @@ def add_item():
 @token_required
 @roles_required("admin", "manager", "viewer")
 def get_items():
-    """Admin/Manager/Viewer: List all inventory items."""
+    """Admin/Manager/Viewer: List all inventory items.
+
+    Accepts optional ?limit=&offset= query params for server-side
+    pagination; without them the full list is returned for backwards
+    compatibility. The JSON array is streamed row by row instead of
+    being materialized as one big string in memory.
+    """
     try:
-        query = supabase.table("items").select("*").order("name")
+        limit = request.args.get("limit", type=int)
+        offset = request.args.get("offset", default=0, type=int)
+
+        # Only the columns the clients actually render - avoids shipping
+        # row metadata for every item on every poll
+        query = (
+            supabase.table("items")
+            .select("id, name, quantity, price, category")
+            .order("name")
+        )
+        if limit is not None and limit > 0:
+            query = query.range(offset, offset + limit - 1)
         result = query.execute()
-        return jsonify(result.data)
+        rows = result.data or []
+
+        def generate():
+            yield "["
+            for index, row in enumerate(rows):
+                if index:
+                    yield ","
+                yield json_dumps(row)
+            yield "]"
+
+        return Response(
+            stream_with_context(generate()), mimetype="application/json"
+        )
     except Exception as e:
         logging.exception(f"Error fetching items: {e}")
         abort(500, description="Failed to retrieve items.")
@@ -78,16 +170,27 @@ def get_items():
 @roles_required("admin", "manager", "viewer")
 def get_item(item_id):
     """Admin/Manager/Viewer: Get details of a specific item."""
+    # Stringify the route UUID once; every lookup below reuses it
+    item_id = str(item_id)
     try:
+        cache_key = item_id
+        with _item_cache_lock:
+            cached = _item_cache.get(cache_key)
+        if cached is not None:
+            return jsonify(cached)
+
         result = (
             supabase.table("items")
-            .select("*")
-            .eq("id", str(item_id))
+            .select("id, name, quantity, price, category")
+            .eq("id", item_id)
             .maybe_single()
             .execute()
         )
         if not result.data:
             abort(404, description="Item not found.")
+
+        with _item_cache_lock:
+            _item_cache[cache_key] = result.data
         return jsonify(result.data)
     except Exception as e:
         logging.error(f"Error fetching item {item_id}: {e}")
@@ -103,62 +206,32 @@ def update_item(item_id):
     if not data:
         abort(400, description="Request body cannot be empty for PUT.")
 
-    update_data = {}
-    allowed_fields = ["name", "quantity", "price", "category"]
-    for field in allowed_fields:
-        if field in data:
-            if field == "quantity":
-                try:
-                    val = int(data[field])
-                    if val < 0:
-                        raise ValueError("Quantity cannot be negative.")
-                    update_data[field] = val
-                except (ValueError, TypeError):
-                    abort(400, description=f"Invalid format for quantity.")
-            elif field == "price":
-                try:
-                    val = float(data[field])
-                    if val < 0:
-                        raise ValueError("Price cannot be negative.")
-                    update_data[field] = val
-                except (ValueError, TypeError):
-                    abort(400, description=f"Invalid format for price.")
-            else:
-                update_data[field] = data[field] # name, category (string)
+    item_id = str(item_id)  # stringify the route UUID once
+    update_data, _missing, invalid = validate_payload(data, ITEM_UPDATE_SPEC)
+    if invalid:
+        bad_field = invalid[0].split(":", 1)[0]
+        abort(400, description=f"Invalid format for {bad_field}.")
 
     if not update_data:
         abort(400, description="No valid fields provided for update.")
 
     try:
-        old_result = (
-            supabase.table("items")
-            .select("*")
-            .eq("id", str(item_id))
-            .maybe_single()
-            .execute()
-        )
-        if not old_result.data:
+        # Single round-trip: the RPC applies the update and returns both
+        # the previous and new row (see backend/sql/functions.sql).
+        # Passing the actor lets the audit trigger record the change in
+        # the same transaction, so no log_audit call is needed here.
+        rpc_result = supabase.rpc(
+            "update_item",
+            {"p_id": item_id, "p_fields": update_data, "p_actor": g.user_id},
+        ).execute()
+
+        row = rpc_result.data[0] if rpc_result.data else None
+        if not row:
             abort(404, description="Item not found.")
-        old_values = old_result.data
-
-        result = (
-            supabase.table("items")
-            .update(update_data)
-            .eq("id", str(item_id))
-            .execute()
-        )
-
-        if not result.data:
-            raise Exception("Failed to update item, no data returned.")
 
-        updated_item = result.data[0]
-        log_audit(
-            action="UPDATE_ITEM",
-            table_name="items",
-            record_id=item_id,
-            old_values=old_values,
-            new_values=updated_item,
-        )
+        updated_item = row["new_item"]
+        _invalidate_item_cache(item_id)
+        invalidate_response_cache()
         return jsonify(updated_item)
 
     except Exception as e:
@@ -171,44 +244,35 @@ def update_item(item_id):
 @roles_required("admin", "manager")
 def update_item_quantity(item_id):
     """Admin/Manager: Update only the quantity of an item."""
+    item_id = str(item_id)  # stringify the route UUID once
     data = request.get_json()
     if not data or "quantity" not in data:
         abort(400, description="Missing 'quantity' field in request body.")
 
-    try:
-        new_quantity = int(data["quantity"])
-        if new_quantity < 0:
+    clean, _missing, invalid = validate_payload(data, ITEM_QUANTITY_SPEC)
+    if invalid:
+        if "negative" in invalid[0]:
             abort(400, description="Quantity cannot be negative.")
+        abort(400, description="Invalid quantity format. Must be an integer.")
+    new_quantity = clean["quantity"]
 
-        old_result = (
-            supabase.table("items")
-            .select("quantity")
-            .eq("id", str(item_id))
-            .maybe_single()
-            .execute()
-        )
-        if not old_result.data:
+    try:
+        # Single round-trip: the RPC returns the previous quantity and the
+        # updated row together (see backend/sql/functions.sql). The audit
+        # trigger records the UPDATE_QUANTITY entry transactionally.
+        rpc_result = supabase.rpc(
+            "update_item_quantity",
+            {"p_id": item_id, "p_qty": new_quantity, "p_actor": g.user_id},
+        ).execute()
+
+        row = rpc_result.data[0] if rpc_result.data else None
+        if not row:
             abort(404, description="Item not found.")
-        old_quantity = old_result.data["quantity"]
-
-        result = (
-            supabase.table("items")
-            .update({"quantity": new_quantity})
-            .eq("id", str(item_id))
-            .execute()
-        )
-
-        if not result.data:
-            raise Exception("Failed to update quantity, no data returned.")
 
-        updated_item = result.data[0]
-        log_audit(
-            action="UPDATE_QUANTITY",
-            table_name="items",
-            record_id=item_id,
-            old_values={"quantity": old_quantity},
-            new_values={"quantity": new_quantity},
-        )
+        old_quantity = row["old_quantity"]
+        updated_item = row["item"]
+        _invalidate_item_cache(item_id)
+        invalidate_response_cache()
         # Check for low stock after update
         if (
             new_quantity < LOW_STOCK_THRESHOLD
@@ -239,29 +303,22 @@ def update_item_quantity(item_id):
 @roles_required("admin")
 def delete_item(item_id):
     """Admin: Delete an inventory item."""
+    item_id = str(item_id)  # stringify the route UUID once
     try:
-        old_result = (
-            supabase.table("items")
-            .select("*")
-            .eq("id", str(item_id))
-            .maybe_single()
-            .execute()
-        )
-        if not old_result.data:
+        # Single round-trip: DELETE ... RETURNING via RPC, with the audit
+        # trigger logging the removed row in the same transaction (see
+        # backend/sql/functions.sql and audit_triggers.sql).
+        rpc_result = supabase.rpc(
+            "delete_item", {"p_id": item_id, "p_actor": g.user_id}
+        ).execute()
+
+        if not rpc_result.data:
             abort(404, description="Item not found.")
-        old_values = old_result.data
 
-        supabase.table("items").delete().eq("id", str(item_id)).execute()
-        # Note: delete() doesn't always return data, check Supabase docs/behavior
-
-        log_audit(
-            action="DELETE_ITEM",
-            table_name="items",
-            record_id=item_id,
-            old_values=old_values,
-        )
-        # 204 No Content is often preferred for successful DELETE
-        return jsonify({"message": "Item deleted successfully"}), 200
+        _invalidate_item_cache(item_id)
+        invalidate_response_cache()
+        # 204 No Content: skip JSON encoding entirely for the empty body
+        return "", 204
 
     except Exception as e:
         logging.error(f"Error deleting item {item_id}: {e}")
@@ -285,48 +342,137 @@ def bulk_update_quantity():
     updated_items_log = []
 
     try:
-        csv_data = io.BytesIO(file.read())
-        df = pd.read_csv(csv_data)
-
-        if "item_id" not in df.columns or "new_quantity" not in df.columns:
+        # Extract the two columns we need directly; the Arrow path never
+        # materializes a DataFrame (no block-manager copy of the file).
+        if pacsv is not None:
+            # Stream the upload straight into Arrow; item_id is forced to
+            # string so numeric-looking IDs aren't mangled.
+            table = pacsv.read_csv(
+                file.stream,
+                convert_options=pacsv.ConvertOptions(
+                    column_types={"item_id": pa.string()}
+                ),
+            )
+            columns = table.column_names
+            if "item_id" in columns and "new_quantity" in columns:
+                ids = table.column("item_id").to_pylist()
+                raw_qty = table.column("new_quantity").to_pylist()
+            else:
+                columns = ()
+        else:
+            csv_data = io.BytesIO(file.read())
+            df = pd.read_csv(csv_data)
+            columns = df.columns
+            if "item_id" in columns and "new_quantity" in columns:
+                ids = df["item_id"].tolist()
+                raw_qty = df["new_quantity"].tolist()
+
+        if "item_id" not in columns or "new_quantity" not in columns:
             abort(
                 400,
                 description="CSV must contain 'item_id' and 'new_quantity' columns.",
             )
 
-        for index, row in df.iterrows():
-            item_id_str = str(row["item_id"]).strip()
-            new_quantity_val = row["new_quantity"]
-
-            try:
-                if not item_id_str:
-                    raise ValueError("Item ID cannot be empty")
-                # Add UUID validation if needed: uuid.UUID(item_id_str)
-
-                new_quantity = int(new_quantity_val)
-                if new_quantity < 0:
-                    raise ValueError("Quantity cannot be negative.")
-
-                old_res = (
-                    supabase.table("items")
-                    .select("quantity")
-                    .eq("id", item_id_str)
-                    .maybe_single()
-                    .execute()
-                )
-                if not old_res.data:
-                    raise ValueError(f"Item ID '{item_id_str}' not found.")
-                old_quantity = old_res.data["quantity"]
-
-                upd_res = (
-                    supabase.table("items")
-                    .update({"quantity": new_quantity})
-                    .eq("id", item_id_str)
-                    .execute()
-                )
-                if not upd_res.data:
-                    raise Exception("Update failed, no data returned from DB.")
+        # Columnar validation: classify every row with array-level ops
+        # instead of a Python-level iterrows() loop.
+        ids_series = pd.Series(ids, dtype="object").fillna("").astype(str).str.strip()
+        ids = ids_series.tolist()
+        qty = pd.to_numeric(pd.Series(raw_qty), errors="coerce").to_numpy()
+
+        bad_qty = ~np.isfinite(qty) | (qty < 0)
+        bad_id = ~ids_series.str.fullmatch(_UUID_RE).to_numpy()
+        bad = bad_qty | bad_id
+
+        results["failed"] = int(bad.sum())
+        for index in np.nonzero(bad)[0]:
+            problems = []
+            if bad_id[index]:
+                problems.append("invalid item ID")
+            if bad_qty[index]:
+                problems.append("invalid quantity")
+            results["errors"].append(
+                f"Row {index + 2}: Invalid data - {', '.join(problems)} "
+                f"(ID: {ids[index]}, Qty: {raw_qty[index]})"
+            )
 
+        valid_indices = np.nonzero(~bad)[0]
+        # Dedupe on item_id with last-row-wins (matching what sequential
+        # application would leave behind) so concurrent chunks never lock
+        # the same row from two transactions.
+        deduped = {}
+        row_numbers = {}  # item_id -> CSV row number, for error reporting
+        for index in valid_indices:
+            deduped[ids[index]] = int(qty[index])
+            row_numbers[ids[index]] = index + 2
+        updates = [
+            {"item_id": item_id, "new_quantity": quantity}
+            for item_id, quantity in deduped.items()
+        ]
+
+        # Apply the batch via the bulk RPC instead of a SELECT + UPDATE
+        # pair per row (see backend/sql/functions.sql), chunked so very
+        # large CSVs stay under PostgREST request-size limits. The
+        # deduped chunks touch disjoint rows, so their round-trips are
+        # fired in parallel on a small thread pool and the waits overlap;
+        # executor.map preserves chunk order in the combined result.
+        low_stock_transitions = []
+        if updates:
+            chunks = [
+                updates[start:start + _BULK_RPC_CHUNK]
+                for start in range(0, len(updates), _BULK_RPC_CHUNK)
+            ]
+
+            def run_chunk(chunk):
+                # A failed chunk must not 500 the request: sibling chunks
+                # may already have committed, so report its rows as failed
+                # and let the rest of the upload stand.
+                try:
+                    return (
+                        supabase.rpc(
+                            "bulk_update_quantity", {"payload": chunk}
+                        ).execute().data
+                        or []
+                    )
+                except Exception as chunk_e:
+                    logging.error(
+                        f"Bulk update chunk of {len(chunk)} rows failed: {chunk_e}"
+                    )
+                    return [
+                        {"item_id": entry["item_id"], "status": "error"}
+                        for entry in chunk
+                    ]
+
+            rpc_rows = []
+            if len(chunks) == 1:
+                rpc_rows = run_chunk(chunks[0])
+            else:
+                with ThreadPoolExecutor(
+                    max_workers=min(4, len(chunks))
+                ) as executor:
+                    for chunk_rows in executor.map(run_chunk, chunks):
+                        rpc_rows.extend(chunk_rows)
+
+            for upd in rpc_rows:
+                item_id_str = str(upd.get("item_id"))
+                row_no = row_numbers.get(item_id_str, "?")
+
+                status = upd.get("status")
+                if status != "updated":
+                    results["failed"] += 1
+                    if status == "error":
+                        results["errors"].append(
+                            f"Row {row_no}: Update failed - database error "
+                            f"applying Item ID '{item_id_str}'."
+                        )
+                    else:
+                        results["errors"].append(
+                            f"Row {row_no}: Invalid data - Item ID '{item_id_str}' not found."
+                        )
+                    continue
+
+                old_quantity = upd.get("old_quantity")
+                new_quantity = upd.get("new_quantity")
+                _invalidate_item_cache(item_id_str)
                 results["success"] += 1
                 updated_items_log.append(
                     {
@@ -339,27 +485,25 @@ def bulk_update_quantity():
                     new_quantity < LOW_STOCK_THRESHOLD
                     and old_quantity >= LOW_STOCK_THRESHOLD
                 ):
-                    log_audit(
-                        action="LOW_STOCK_TRIGGERED",
-                        table_name="items",
-                        record_id=item_id_str,
-                        new_values={
-                            "quantity": new_quantity,
-                            "threshold": LOW_STOCK_THRESHOLD,
-                        },
+                    low_stock_transitions.append(
+                        {"item_id": item_id_str, "quantity": new_quantity}
                     )
-                    # TODO: Implement notification sending
 
-            except (ValueError, TypeError) as ve:
-                results["failed"] += 1
-                results["errors"].append(
-                    f"Row {index + 2}: Invalid data - {ve} (ID: {item_id_str}, Qty: {new_quantity_val})"
-                )
-            except Exception as e:
-                results["failed"] += 1
-                results["errors"].append(
-                    f"Row {index + 2}: Failed to update item {item_id_str} - {e}"
-                )
+        if results["success"]:
+            invalidate_response_cache()
+
+        # One aggregated audit entry for all low-stock transitions in this
+        # upload instead of an insert per affected item
+        if low_stock_transitions:
+            log_audit(
+                action="LOW_STOCK_TRIGGERED",
+                table_name="items",
+                new_values={
+                    "threshold": LOW_STOCK_THRESHOLD,
+                    "items": low_stock_transitions,
+                },
+            )
+            # TODO: Implement notification sending
 
         log_audit(
             action="BULK_UPDATE_QUANTITY",
@@ -373,6 +517,8 @@ def bulk_update_quantity():
     except pd.errors.ParserError:
         abort(400, description="Error parsing CSV file. Please check format.")
     except Exception as e:
+        if pa is not None and isinstance(e, pa.ArrowInvalid):
+            abort(400, description="Error parsing CSV file. Please check format.")
         logging.error(f"Error during bulk update: {e}")
         log_audit(
             action="BULK_UPDATE_QUANTITY_FAILED", new_values={"error": str(e)}
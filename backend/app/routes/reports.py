@@ -1,21 +1,57 @@
 # backend/app/routes/reports.py
 import logging
-from datetime import datetime
-from flask import Blueprint, jsonify, request, abort, g
+import threading
+from datetime import datetime, timezone
+from cachetools import TTLCache
+from flask import (
+    Blueprint,
+    Response,
+    jsonify,
+    request,
+    abort,
+    g,
+    stream_with_context,
+)
 
 # Import decorators, helpers, and supabase client
 from ..utils.auth import token_required, roles_required
-from ..utils.helpers import log_audit, LOW_STOCK_THRESHOLD
+from ..utils.cache import http_cached, ttl_cached
+from ..utils.helpers import log_audit, LOW_STOCK_THRESHOLD, json_dumps
 from .. import supabase # Import the initialized Supabase client
 
 # Create Blueprint - Use a general /api prefix as routes are distinct
 reports_bp = Blueprint("reports", __name__, url_prefix="/api")
 
+# Page size for the streamed monthly snapshot fetch
+_SNAPSHOT_PAGE_SIZE = 1000
+
+# The streamed report response bypasses the response cache (ttl_cached
+# skips streamed bodies), so the totals scalars that drive the report
+# head get their own short TTL cache - polling the report no longer
+# re-runs the aggregate every time. Staleness is bounded by the same
+# 30s window the response cache uses.
+_totals_cache = TTLCache(maxsize=1, ttl=30)
+_totals_cache_lock = threading.Lock()
+
+
+def _inventory_totals():
+    """inventory_totals RPC scalars, cached for a short window."""
+    with _totals_cache_lock:
+        cached = _totals_cache.get("totals")
+    if cached is not None:
+        return cached
+    data = supabase.rpc("inventory_totals").execute().data
+    totals = data[0] if data else {}
+    with _totals_cache_lock:
+        _totals_cache["totals"] = totals
+    return totals
+
 
 # == Reports and Alerts ==
 @reports_bp.route("/alerts/low-stock", methods=["GET"])
 @token_required
 @roles_required("admin", "manager")
+@ttl_cached
 def get_low_stock_alerts():
     """Admin/Manager: Get items below the low stock threshold."""
     try:
@@ -35,47 +71,123 @@ def get_low_stock_alerts():
         abort(500, description="Failed to retrieve low stock alerts.")
 
 
+@reports_bp.route("/dashboard", methods=["GET"])
+@token_required
+@roles_required("admin", "manager")
+@ttl_cached
+def get_dashboard_overview():
+    """Admin/Manager: Items, low-stock alerts and totals in one call.
+
+    The dashboard previously issued these as three sequential requests;
+    the dashboard_overview RPC (see backend/sql/functions.sql) returns
+    all three payloads from a single round-trip.
+    """
+    try:
+        threshold = request.args.get(
+            "threshold", default=LOW_STOCK_THRESHOLD, type=int
+        )
+        result = supabase.rpc(
+            "dashboard_overview", {"p_threshold": threshold}
+        ).execute()
+        return jsonify(result.data or {})
+    except Exception as e:
+        logging.error(f"Error fetching dashboard overview: {e}")
+        abort(500, description="Failed to retrieve dashboard overview.")
+
+
 @reports_bp.route("/reports/inventory/monthly", methods=["GET"])
 @token_required
 @roles_required("admin")
+@ttl_cached
+@http_cached
 def get_monthly_inventory_report():
     """Admin: Generate a monthly inventory report (basic: current snapshot)."""
     try:
         # Note: year/month args aren't used in the current logic which fetches live data
         # Keep them if you plan to implement historical reporting later
-        year = request.args.get("year", default=datetime.utcnow().year, type=int)
-        month = request.args.get(
-            "month", default=datetime.utcnow().month, type=int
-        )
+        now = datetime.now(timezone.utc)  # one clock read for the request
+        year = request.args.get("year", default=now.year, type=int)
+        month = request.args.get("month", default=now.month, type=int)
 
-        items_result = (
-            supabase.table("items")
-            .select("id, name, quantity, price, category")
-            .order("name")
-            .execute()
-        )
+        # Totals come from a single SQL aggregate (see
+        # backend/sql/functions.sql) instead of pulling every item row
+        # over the wire and summing in Python, cached briefly above.
+        totals = _inventory_totals()
 
-        total_value = sum(
-            item["quantity"] * float(item.get("price", 0)) # Handle potential missing price
-            for item in items_result.data
+        # The item snapshot is only fetched when wanted; pass
+        # ?include_snapshot=false to get just the O(1) scalars.
+        include_snapshot = (
+            request.args.get("include_snapshot", default="true").lower()
+            != "false"
         )
-        total_items = sum(item["quantity"] for item in items_result.data)
-        distinct_item_count = len(items_result.data)
+        ndjson = request.args.get("format", default="json").lower() == "ndjson"
 
-        report_data = {
+        def snapshot_rows():
+            # Pull the snapshot in pages inside the response generator so
+            # peak memory is one page, not the whole table.
+            offset = 0
+            while include_snapshot:
+                page = (
+                    supabase.table("items")
+                    .select("id, name, quantity, price, category")
+                    .order("name")
+                    .range(offset, offset + _SNAPSHOT_PAGE_SIZE - 1)
+                    .execute()
+                    .data
+                    or []
+                )
+                for row in page:
+                    yield row
+                if len(page) < _SNAPSHOT_PAGE_SIZE:
+                    return
+                offset += _SNAPSHOT_PAGE_SIZE
+
+        report_head = {
             "report_month": f"{year}-{month:02d}",
-            "generated_at": datetime.utcnow().isoformat(),
-            "total_distinct_items": distinct_item_count,
-            "total_units": total_items,
-            "total_inventory_value": round(total_value, 2),
-            "inventory_snapshot": items_result.data,
+            "generated_at": now.isoformat(),
+            "total_distinct_items": totals.get("distinct_items", 0),
+            "total_units": totals.get("total_units", 0),
+            "total_inventory_value": round(
+                float(totals.get("total_value") or 0), 2
+            ),
         }
 
         log_audit(
             action="GENERATE_MONTHLY_REPORT",
             new_values={"month": f"{year}-{month:02d}"},
         )
-        return jsonify(report_data)
+
+        # The scalars-only variant is small and non-streamed, so it goes
+        # through jsonify and the ttl_cached/http_cached decorators apply
+        # (response cache hits and 304 revalidation).
+        if not include_snapshot and not ndjson:
+            return jsonify({**report_head, "inventory_snapshot": []})
+
+        # Stream the document: scalars first, then snapshot rows one at a
+        # time, so the full JSON string is never materialized in memory.
+        # ?format=ndjson emits the head and one item per line instead of
+        # a single JSON document, letting clients parse incrementally.
+        # Note the streamed variants bypass ttl_cached/http_cached (both
+        # skip streamed bodies) - constant memory is traded for cache
+        # hits here, which the totals cache above partly wins back.
+        def generate():
+            head_json = json_dumps(report_head)
+            if ndjson:
+                yield head_json + "\n"
+                for row in snapshot_rows():
+                    yield json_dumps(row) + "\n"
+                return
+            yield head_json[:-1] + ',"inventory_snapshot":['
+            for index, row in enumerate(snapshot_rows()):
+                if index:
+                    yield ","
+                yield json_dumps(row)
+            yield "]}"
+
+        return Response(
+            stream_with_context(generate()),
+            mimetype="application/x-ndjson" if ndjson else "application/json",
+        )
 
     except Exception as e:
         logging.error(f"Error generating monthly report: {e}")
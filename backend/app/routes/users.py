@@ -4,13 +4,18 @@ from flask import Blueprint, jsonify, request, abort, g
 import uuid # Import uuid
 
 # Import decorators, helpers, and supabase client
-from ..utils.auth import token_required, roles_required
-from ..utils.helpers import log_audit
+from ..utils.auth import token_required, roles_required, invalidate_role_cache
 from .. import supabase # Import the initialized Supabase client
 
 # Create Blueprint
 users_bp = Blueprint("users", __name__, url_prefix="/api/users")
 
+# Roles that can be assigned, with the 400 message formatted once
+ALLOWED_ROLES = frozenset({"admin", "manager", "viewer"})
+_INVALID_ROLE_DESC = (
+    f"Invalid role. Must be one of: {', '.join(sorted(ALLOWED_ROLES))}"
+)
+
 
 # == User Role Management ==
 @users_bp.route("", methods=["GET"])
@@ -20,94 +25,30 @@ def get_users():
     """Admin: List users and their roles."""
     logging.debug("Attempting to fetch users and roles...")
     try:
-        logging.debug("Fetching data from user_roles...")
-        roles_result = supabase.table("user_roles").select("user_id, role").execute()
+        # Single RPC joining auth.users and user_roles server-side
+        # (see backend/sql/functions.sql). Avoids paging through every
+        # auth user via admin.list_users() and filtering in Python.
+        result = supabase.rpc("get_users_with_roles").execute()
 
-        if not hasattr(roles_result, "data"):
+        if not hasattr(result, "data"):
             logging.error(
-                f"Unexpected response structure from user_roles query: {roles_result}"
-            )
-            abort(500, description="Failed to retrieve roles (unexpected response).")
-
-        logging.debug(f"Fetched {len(roles_result.data)} roles from user_roles.")
-        if not roles_result.data:
-            logging.info("No users found in user_roles table.")
-            return jsonify([])
-
-        user_ids = []
-        try:
-            for u in roles_result.data:
-                user_id = u.get("user_id")
-                if user_id:
-                    user_ids.append(str(user_id))
-                else:
-                    logging.warning(f"Found entry in user_roles without user_id: {u}")
-            if not user_ids:
-                logging.warning("No valid user_ids found in user_roles data.")
-                return jsonify([])
-            logging.debug(f"User IDs to fetch from auth.users: {user_ids}")
-        except Exception as e:
-            logging.exception(f"Unexpected error processing user IDs from roles: {e}")
-            abort(500, description="Internal error processing role data.")
-
-        logging.debug(f"Fetching emails for {len(user_ids)} users from auth.users...")
-        try:
-            # Use the admin API to list users
-            list_users_response = supabase.auth.admin.list_users()
-
-            # Handle potential pagination or different response structures
-            auth_users_list = []
-            if isinstance(list_users_response, list):
-                auth_users_list = list_users_response # Direct list response
-            elif hasattr(list_users_response, 'users'):
-                auth_users_list = list_users_response.users # Response object with 'users' attribute
-            else:
-                logging.error(f"Unexpected response type from list_users: {type(list_users_response)}")
-                abort(500, description="Failed to parse user list from authentication system.")
-
-
-            # Filter the list from auth based on IDs found in user_roles
-            filtered_users_data = [
-                {"id": str(user.id), "email": getattr(user, 'email', 'N/A')}
-                for user in auth_users_list
-                if str(user.id) in user_ids
-            ]
-            logging.debug(f"Filtered {len(filtered_users_data)} users from auth list.")
-
-        except Exception as e:
-            logging.exception(f"Error calling supabase.auth.admin.list_users(): {e}")
-            abort(
-                500,
-                description="Failed to retrieve user details from authentication system.",
+                f"Unexpected response structure from get_users_with_roles: {result}"
             )
+            abort(500, description="Failed to retrieve users (unexpected response).")
 
-        users_map = {}
-        try:
-            users_map = {
-                str(u["id"]): u.get("email")
-                for u in filtered_users_data
-                if "id" in u
+        users_with_roles = [
+            {
+                "user_id": str(row.get("user_id")),
+                "role": row.get("role", "N/A"),
+                "email": row.get("email") or "N/A",
             }
-        except Exception as e:
-            logging.exception(
-                f"Unexpected error creating users_map from filtered auth data: {e}"
-            )
-            abort(500, description="Internal error processing user details.")
-
-        users_with_roles = []
-        for role_info in roles_result.data:
-            user_id = str(role_info.get("user_id"))
-            if user_id:
-                users_with_roles.append(
-                    {
-                        "user_id": user_id,
-                        "role": role_info.get("role", "N/A"),
-                        "email": users_map.get(user_id, "N/A"), # Use N/A if email not found
-                    }
-                )
+            for row in (result.data or [])
+            if row.get("user_id")
+        ]
 
         logging.debug(
-            f"Successfully prepared list of {len(users_with_roles)} users with roles."
+            "Successfully prepared list of %d users with roles.",
+            len(users_with_roles),
         )
         return jsonify(users_with_roles)
 
@@ -122,7 +63,7 @@ def get_users():
 def get_user_role(user_id):
     """Get the role of a specific user."""
     target_user_id = str(user_id)
-    logging.debug(f"Attempting to fetch role for user_id: {target_user_id}")
+    logging.debug("Attempting to fetch role for user_id: %s", target_user_id)
 
     try:
         result = (
@@ -161,7 +102,9 @@ def get_user_role(user_id):
             abort(404, description="User role data is incomplete.")
 
         logging.debug(
-            f"Successfully fetched role '{user_role}' for user_id: {target_user_id}"
+            "Successfully fetched role '%s' for user_id: %s",
+            user_role,
+            target_user_id,
         )
         return jsonify({"user_id": target_user_id, "role": user_role}), 200
 
@@ -181,68 +124,50 @@ def assign_user_role(user_id):
         abort(400, description="Missing 'role' field in request body.")
 
     new_role = data["role"]
-    allowed_roles = ("admin", "manager", "viewer")
-    if new_role not in allowed_roles:
-        abort(
-            400,
-            description=f"Invalid role. Must be one of: {', '.join(allowed_roles)}",
-        )
+    if new_role not in ALLOWED_ROLES:
+        abort(400, description=_INVALID_ROLE_DESC)
 
     target_user_id = str(user_id)
 
     try:
-        # Check if user exists in auth system first
+        # Single round-trip: the RPC upserts the role and returns the
+        # previous value (see backend/sql/functions.sql). A non-existent
+        # user surfaces as a foreign-key violation on user_roles.user_id,
+        # which replaces the separate auth existence check. The audit
+        # trigger records the change transactionally using p_actor.
         try:
-            supabase.auth.admin.get_user_by_id(target_user_id)
-            logging.debug(f"User {target_user_id} confirmed to exist in auth.")
-        except Exception as auth_e:
-            if "User not found" in str(auth_e): # Example check
+            rpc_result = supabase.rpc(
+                "assign_user_role",
+                {
+                    "p_user_id": target_user_id,
+                    "p_role": new_role,
+                    "p_actor": g.user_id,
+                },
+            ).execute()
+        except Exception as rpc_e:
+            # Only a foreign-key violation on user_roles.user_id means the
+            # target user does not exist; match the SQLSTATE (exposed as
+            # .code on postgrest's APIError) or the constraint name rather
+            # than a loose substring, so other RPC failures still 500.
+            rpc_msg = str(getattr(rpc_e, "message", rpc_e))
+            if (
+                getattr(rpc_e, "code", None) == "23503"
+                or "user_roles_user_id_fkey" in rpc_msg
+            ):
                 logging.warning(f"Attempted to assign role to non-existent user: {target_user_id}")
                 abort(404, description="User not found in authentication system.")
-            else:
-                logging.error(f"Error checking user existence in auth before role assignment: {auth_e}")
-                abort(500, description="Failed to verify user existence.")
+            raise
 
+        row = rpc_result.data[0] if rpc_result.data else None
+        old_role = row.get("old_role") if row else None
 
-        # Check current role in user_roles table
-        old_result = (
-            supabase.table("user_roles")
-            .select("role")
-            .eq("user_id", target_user_id)
-            .maybe_single()
-            .execute()
-        )
-
-        old_role = None
-        action = "ASSIGN_ROLE" # Default action
-
-        if old_result.data:
-            old_role = old_result.data.get("role")
-            if old_role == new_role:
-                return jsonify({"message": "User already has this role."}), 200
-            action = "UPDATE_ROLE" # Change action if role exists
+        if old_role == new_role:
+            # No change: 204 skips building a redundant confirmation body
+            return "", 204
 
-        # Perform Upsert (Insert or Update)
-        # Use upsert to handle both cases: user exists in auth but not user_roles, or user exists in both
-        result = (
-            supabase.table("user_roles")
-            .upsert({"user_id": target_user_id, "role": new_role})
-            .execute()
-        )
+        # Drop any cached role so the change takes effect immediately
+        invalidate_role_cache(target_user_id)
 
-        # Check if upsert was successful (response structure might vary)
-        if not result.data:
-             # Log potential issue, but proceed assuming success if no error raised
-             logging.warning(f"Upsert for user {target_user_id} role returned no data, but no error raised.")
-             # Consider adding more robust check based on actual Supabase client behavior
-
-        log_audit(
-            action=action,
-            table_name="user_roles",
-            record_id=target_user_id,
-            old_values={"role": old_role} if old_role else None,
-            new_values={"role": new_role},
-        )
         return jsonify({"user_id": target_user_id, "role": new_role})
 
     except Exception as e:
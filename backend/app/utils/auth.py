@@ -1,11 +1,85 @@
 # backend/app/utils/auth.py
+import base64
+import hashlib
+import json
 import logging
+import threading
+import time
 from functools import wraps
+from cachetools import TTLCache
 from flask import request, jsonify, g, abort
 
 # Import the globally initialized supabase client from the app package
 from .. import supabase
 
+# --- JWT Validation Cache ---
+# supabase.auth.get_user() is a blocking HTTPS round-trip to GoTrue on every
+# request. Cache successful validations in-process, keyed by a hash of the
+# token, so repeat requests with the same token skip the network call.
+# Entries honor the JWT's own 'exp' claim, capped at _JWT_CACHE_TTL seconds.
+_JWT_CACHE_TTL = 300
+_jwt_cache = TTLCache(maxsize=10000, ttl=_JWT_CACHE_TTL)
+_jwt_cache_lock = threading.Lock()
+
+
+def _jwt_cache_key(token):
+    """Hash the raw token so full JWTs aren't kept in memory as cache keys."""
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+
+def _jwt_exp(token):
+    """Best-effort read of the JWT 'exp' claim (middle segment, base64).
+
+    No signature verification is done here - the claim is only used to bound
+    the cache TTL. Returns 0 if the token can't be decoded.
+    """
+    try:
+        payload_b64 = token.split(".")[1]
+        payload_b64 += "=" * (-len(payload_b64) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(payload_b64))
+        return int(payload.get("exp", 0))
+    except Exception:
+        return 0
+
+
+# --- User Role Cache ---
+# roles_required hits user_roles with a SELECT on every decorated call. Keep
+# the fetched role on flask.g for the duration of the request and back it
+# with a short process-wide TTL cache so repeat requests by the same user
+# skip the round-trip too. assign_user_role invalidates entries on writes.
+_ROLE_CACHE_TTL = 60
+_role_cache = TTLCache(maxsize=5000, ttl=_ROLE_CACHE_TTL)
+_role_cache_lock = threading.Lock()
+
+
+def _fetch_role(user_id):
+    """Fetch a user's role from user_roles, via the TTL cache.
+
+    Returns the role string, or None if the user has no role assigned.
+    """
+    with _role_cache_lock:
+        if user_id in _role_cache:
+            return _role_cache[user_id]
+
+    result = (
+        supabase.table("user_roles")
+        .select("role")
+        .eq("user_id", user_id)
+        .maybe_single()
+        .execute()
+    )
+    role = result.data.get("role") if result.data else None
+    if role is not None:
+        with _role_cache_lock:
+            _role_cache[user_id] = role
+    return role
+
+
+def invalidate_role_cache(user_id):
+    """Drop a user's cached role (call after writes to user_roles)."""
+    with _role_cache_lock:
+        _role_cache.pop(user_id, None)
+
 
 # --- Authentication & Authorization Decorators ---
 def token_required(f):
@@ -19,7 +93,8 @@ def token_required(f):
             parts = auth_header.split()
             if len(parts) == 2 and parts[0].lower() == "bearer":
                 token = parts[1]
-                logging.debug(f"Received token: {token[:5]}...{token[-5:]}")
+                # Lazy %s formatting: no string build unless DEBUG is on
+                logging.debug("Received token: %s...%s", token[:5], token[-5:])
             else:
                 logging.warning(
                     f"Invalid Authorization header format: {auth_header}"
@@ -35,45 +110,81 @@ def token_required(f):
             logging.warning("Authorization token is missing.")
             abort(401, description="Token is missing")
 
+        # Check the validation cache before going over the network.
+        cache_key = _jwt_cache_key(token)
+        with _jwt_cache_lock:
+            cached = _jwt_cache.get(cache_key)
+        if cached and cached[2] > time.time():
+            g.user_id, g.user_email = cached[0], cached[1]
+            logging.debug(
+                "Token validated from cache for user: %s", g.user_id
+            )
+            return f(*args, **kwargs)
+
         try:
             logging.debug(
-                "Attempting to validate token with supabase.auth.get_user..."
+                "Attempting to validate token via auth_and_role RPC..."
             )
-            # Use the imported supabase client's auth methods
-            user_response = supabase.auth.get_user(jwt=token)
+            # Single round-trip: the JWT is verified inside Postgres and the
+            # caller's role comes back in the same response, replacing the
+            # sequential GoTrue get_user + user_roles select pair.
+            # See backend/sql/functions.sql for the function definition.
+            rpc_response = supabase.rpc(
+                "auth_and_role", {"jwt": token}
+            ).execute()
 
-            if user_response and user_response.user:
-                g.user = user_response.user
-                g.user_id = user_response.user.id
-                g.user_email = getattr(user_response.user, 'email', None) # Safely get email
+            row = rpc_response.data[0] if rpc_response.data else None
+            if row and row.get("user_id"):
+                g.user_id = row["user_id"]
+                g.user_email = row.get("email")
+                g.user_role = row.get("role")
                 logging.info(
-                    f"Token validated successfully via Supabase for user: {g.user_id} ({g.user_email or 'No email'})"
+                    f"Token validated successfully via RPC for user: {g.user_id} ({g.user_email or 'No email'})"
+                )
+                # Cache the result until the token itself expires (capped at
+                # _JWT_CACHE_TTL so revocations aren't masked for too long).
+                expires_at = min(
+                    _jwt_exp(token) or 0, time.time() + _JWT_CACHE_TTL
                 )
+                if expires_at > time.time():
+                    with _jwt_cache_lock:
+                        _jwt_cache[cache_key] = (
+                            g.user_id,
+                            g.user_email,
+                            expires_at,
+                        )
+                if g.user_role:
+                    with _role_cache_lock:
+                        _role_cache[g.user_id] = g.user_role
             else:
                 logging.error(
-                    f"supabase.auth.get_user succeeded but returned invalid data: {user_response}"
+                    f"auth_and_role RPC succeeded but returned invalid data: {rpc_response}"
                 )
                 abort(
                     500, description="Authentication check failed unexpectedly."
                 )
 
         except Exception as e:
-            # Check if it's likely an AuthApiError (adjust based on actual exception type if needed)
-            if hasattr(e, 'message') and hasattr(e, 'status'):
+            # PostgREST surfaces verification failures as APIError with a message
+            error_msg = str(getattr(e, 'message', '')).lower()
+            if error_msg:
                 logging.warning(
-                    f"Token validation failed via Supabase: {e.message} (Status: {e.status})"
+                    f"Token validation failed via auth_and_role RPC: {error_msg}"
                 )
-                if "invalid JWT" in str(e.message).lower():
-                    msg = "Invalid token provided."
-                elif "JWT expired" in str(e.message).lower():
+                # Make sure a rejected token is not served from the cache.
+                with _jwt_cache_lock:
+                    _jwt_cache.pop(cache_key, None)
+                if "expired" in error_msg:
                     msg = "Token has expired."
+                elif "invalid" in error_msg or "signature" in error_msg:
+                    msg = "Invalid token provided."
                 else:
                     msg = "Authentication failed."
                 abort(401, description=msg) # Use abort
             else:
                 # Catch any other unexpected errors
                 logging.exception(
-                    f"An unexpected error occurred during Supabase token validation: {e}"
+                    f"An unexpected error occurred during token validation: {e}"
                 )
                 abort(
                     500,
@@ -89,6 +200,14 @@ def roles_required(*required_roles):
     """Decorator factory to check user roles (using g.user_id set by token_required)."""
 
     def decorator(f):
+        # Constants per decoration: O(1) set membership for the check that
+        # runs on every authenticated request, and the denial message
+        # formatted once instead of per 403
+        required_set = frozenset(required_roles)
+        forbidden_desc = (
+            f"Access forbidden: Requires role(s) {', '.join(required_roles)}"
+        )
+
         @wraps(f)
         def decorated_function(*args, **kwargs):
             if not hasattr(g, "user_id") or not g.user_id:
@@ -102,19 +221,18 @@ def roles_required(*required_roles):
 
             user_id = g.user_id
             logging.debug(
-                f"Checking roles for user: {user_id}. Required: {required_roles}"
+                "Checking roles for user: %s. Required: %s",
+                user_id,
+                required_roles,
             )
             try:
-                # Use the imported supabase client
-                result = (
-                    supabase.table("user_roles")
-                    .select("role")
-                    .eq("user_id", user_id)
-                    .maybe_single()
-                    .execute()
-                )
+                # Reuse the role if it was already resolved earlier in this
+                # request (e.g. by a previous decorator or helper).
+                user_role = getattr(g, "user_role", None)
+                if not user_role:
+                    user_role = _fetch_role(user_id)
 
-                if not result.data:
+                if not user_role:
                     logging.warning(
                         f"No role found in 'user_roles' table for user_id: {user_id}"
                     )
@@ -124,20 +242,16 @@ def roles_required(*required_roles):
                         description="User role not assigned. Please contact an administrator.",
                     )
 
-                user_role = result.data.get("role")
                 g.user_role = user_role # Store role in context
 
-                if user_role not in required_roles:
+                if user_role not in required_set:
                     logging.warning(
                         f"Authorization failed: User {user_id} with role '{user_role}' attempted action requiring roles: {required_roles}"
                     )
-                    abort(
-                        403,
-                        description=f"Access forbidden: Requires role(s) {', '.join(required_roles)}",
-                    )
+                    abort(403, description=forbidden_desc)
 
                 logging.debug(
-                    f"User {user_id} authorized with role: {user_role}"
+                    "User %s authorized with role: %s", user_id, user_role
                 )
 
             except Exception as e:
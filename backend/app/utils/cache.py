@@ -0,0 +1,87 @@
+# backend/app/utils/cache.py
+"""Short-TTL response cache for read-heavy report endpoints.
+
+Dashboard clients poll the low-stock and monthly-report endpoints every
+few seconds; caching the rendered response for a short window coalesces
+those polls into one Supabase query per TTL window. Item write paths
+call invalidate_response_cache() so mutations are visible immediately
+within the same process; the TTL bounds staleness across workers.
+"""
+import hashlib
+import logging
+import threading
+from functools import wraps
+from cachetools import TTLCache
+from flask import Response, make_response, request
+
+_RESPONSE_CACHE_TTL = 30
+_response_cache = TTLCache(maxsize=128, ttl=_RESPONSE_CACHE_TTL)
+_response_cache_lock = threading.RLock()
+
+
+def ttl_cached(view):
+    """Cache a view's rendered body, keyed on (path, query args).
+
+    Apply below the auth decorators so authentication and role checks
+    still run on every request; only the database work is skipped.
+    Only 200 responses are cached.
+    """
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = (request.path, tuple(sorted(request.args.items())))
+        with _response_cache_lock:
+            cached = _response_cache.get(key)
+        if cached is not None:
+            body, mimetype, etag = cached
+            response = Response(body, mimetype=mimetype)
+            response.set_etag(etag)
+            response.cache_control.max_age = _RESPONSE_CACHE_TTL
+            response.cache_control.private = True
+            # Matching If-None-Match turns the hit into an empty 304
+            return response.make_conditional(request)
+
+        response = make_response(view(*args, **kwargs))
+        # Streamed responses pass through uncached - buffering them here
+        # would defeat their constant-memory purpose.
+        if response.status_code == 200 and not response.is_streamed:
+            body = response.get_data()
+            etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+            response.set_etag(etag)
+            with _response_cache_lock:
+                _response_cache[key] = (body, response.mimetype, etag)
+        return response
+
+    return wrapper
+
+
+def http_cached(view, max_age=60):
+    """Add Cache-Control and ETag headers and answer If-None-Match.
+
+    A matching client revalidation gets an empty 304 instead of the full
+    body, so polling dashboards skip the transfer and re-parse when the
+    underlying data hasn't changed. Streamed responses pass through
+    untouched - hashing them would require buffering the whole body.
+    """
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        response = make_response(view(*args, **kwargs))
+        if response.status_code != 200 or response.is_streamed:
+            return response
+        etag = hashlib.blake2b(
+            response.get_data(), digest_size=16
+        ).hexdigest()
+        response.set_etag(etag)
+        response.cache_control.max_age = max_age
+        response.cache_control.private = True
+        return response.make_conditional(request)
+
+    return wrapper
+
+
+def invalidate_response_cache():
+    """Drop all cached report responses (call after inventory writes)."""
+    with _response_cache_lock:
+        _response_cache.clear()
+    logging.debug("Report response cache invalidated.")
@@ -1,6 +1,10 @@
 # backend/app/utils/helpers.py
+import atexit
 import logging
-from datetime import datetime
+import queue
+import threading
+import time
+from datetime import datetime, timezone
 from flask import request, g
 
 # Import the globally initialized supabase client from the app package
@@ -9,6 +13,94 @@ from .. import supabase
 # --- Constants ---
 LOW_STOCK_THRESHOLD = 10
 
+# JSON encoder matching the app-wide orjson provider, for hand-built
+# streamed responses that bypass jsonify
+try:
+    import orjson
+
+    def json_dumps(obj):
+        return orjson.dumps(
+            obj, option=orjson.OPT_SERIALIZE_NUMPY
+        ).decode("utf-8")
+
+except ImportError:
+    import json as _json
+
+    def json_dumps(obj):
+        return _json.dumps(obj)
+
+# --- Audit Log Queue ---
+# Audit inserts used to be a synchronous HTTPS round-trip on the critical
+# path of every write endpoint. Entries now go onto a bounded in-process
+# queue and a daemon thread flushes them to audit_logs in batches. The
+# queue is bounded with a drop-oldest policy so an audit backlog can never
+# exhaust the web worker's memory.
+_AUDIT_QUEUE_MAXSIZE = 10000
+_AUDIT_BATCH_SIZE = 100
+_AUDIT_FLUSH_INTERVAL = 0.2  # seconds to wait for a batch to fill up
+
+_audit_queue = queue.Queue(maxsize=_AUDIT_QUEUE_MAXSIZE)
+
+
+def _flush_audit_batch(batch):
+    """Insert a batch of audit entries in one call. Never raises."""
+    if not batch:
+        return
+    try:
+        # Timestamp formatting happens here, off the request path: each
+        # entry carries the cheap time.time_ns() captured at enqueue and
+        # is rendered to ISO 8601 once, in the writer thread.
+        for entry in batch:
+            ns = entry.pop("_ts_ns", None)
+            if ns is not None:
+                entry["timestamp"] = datetime.fromtimestamp(
+                    ns / 1e9, tz=timezone.utc
+                ).isoformat()
+        supabase.table("audit_logs").insert(batch).execute()
+        logging.debug("Flushed %d audit log entries.", len(batch))
+    except Exception as e:
+        logging.error(
+            f"Failed to insert audit log batch of {len(batch)}: {e}"
+        )
+
+
+def _audit_worker():
+    """Drain the audit queue, batching up to _AUDIT_BATCH_SIZE entries or
+    _AUDIT_FLUSH_INTERVAL seconds, whichever comes first."""
+    while True:
+        try:
+            batch = [_audit_queue.get()]  # block until there is work
+            deadline = time.monotonic() + _AUDIT_FLUSH_INTERVAL
+            while len(batch) < _AUDIT_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(_audit_queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            _flush_audit_batch(batch)
+        except Exception:
+            logging.exception("Unexpected error in audit log worker.")
+
+
+_audit_thread = threading.Thread(
+    target=_audit_worker, name="audit-log-writer", daemon=True
+)
+_audit_thread.start()
+
+
+@atexit.register
+def _drain_audit_queue():
+    """Flush anything still queued when the process exits."""
+    batch = []
+    while True:
+        try:
+            batch.append(_audit_queue.get_nowait())
+        except queue.Empty:
+            break
+    _flush_audit_batch(batch)
+
 
 # --- Helper Functions ---
 def log_audit(
@@ -36,17 +128,33 @@ def log_audit(
         "record_id": str(record_id) if record_id else None,
         "old_values": old_values if old_values else None,
         "new_values": new_values if new_values else None,
-        "timestamp": datetime.utcnow().isoformat(),
+        # Capture the instant cheaply; the writer thread formats it
+        "_ts_ns": time.time_ns(),
         "ip_address": request.remote_addr,
         # Add success field if your audit_logs table has it
         # "success": success
     }
     try:
-        # Use the imported service role client to insert logs
-        supabase.table("audit_logs").insert(log_entry).execute()
-        logging.debug(f"Audit log created: {action} by {user_id or 'System'}")
+        # Fire-and-forget: hand the entry to the background writer instead
+        # of blocking the response on an insert round-trip. Note the entry
+        # is fully built above, inside the request context.
+        try:
+            _audit_queue.put_nowait(log_entry)
+        except queue.Full:
+            # Drop the oldest entry rather than blocking the request
+            try:
+                dropped = _audit_queue.get_nowait()
+                logging.warning(
+                    f"Audit queue full; dropped oldest entry: {dropped.get('action')}"
+                )
+            except queue.Empty:
+                pass
+            _audit_queue.put_nowait(log_entry)
+        logging.debug(
+            "Audit log queued: %s by %s", action, user_id or "System"
+        )
     except Exception as e:
         logging.error(
-            f"Failed to insert audit log: {e} - Entry: {log_entry}"
+            f"Failed to queue audit log: {e} - Entry: {log_entry}"
         )
 
@@ -0,0 +1,70 @@
+# backend/app/utils/validation.py
+"""Precompiled request-shape validation.
+
+Each endpoint's payload shape is declared once at import time as a spec
+mapping field name -> (caster, required). Requests are then checked with
+a single pass over the spec instead of a hand-rolled try/except ladder
+of int()/float() casts inside every route. Casters raise ValueError or
+TypeError on bad input.
+"""
+
+
+def non_negative_int(value):
+    number = int(value)
+    if number < 0:
+        raise ValueError("cannot be negative")
+    return number
+
+
+def non_negative_number(value):
+    number = float(value)
+    if number < 0:
+        raise ValueError("cannot be negative")
+    return number
+
+
+def text(value):
+    """Pass-through caster for free-form string fields."""
+    return value
+
+
+# --- Payload specs (compiled once at import) ---
+ITEM_CREATE_SPEC = {
+    "name": (text, True),
+    "quantity": (non_negative_int, True),
+    "price": (non_negative_number, True),
+    "category": (text, False),
+}
+
+ITEM_UPDATE_SPEC = {
+    "name": (text, False),
+    "quantity": (non_negative_int, False),
+    "price": (non_negative_number, False),
+    "category": (text, False),
+}
+
+ITEM_QUANTITY_SPEC = {
+    "quantity": (non_negative_int, True),
+}
+
+
+def validate_payload(data, spec):
+    """Validate a JSON payload against a spec.
+
+    Returns (clean, missing, invalid): the successfully cast fields, the
+    names of absent required fields, and '<field>: <reason>' strings for
+    fields that failed their caster. Unknown fields are ignored.
+    """
+    clean = {}
+    missing = []
+    invalid = []
+    for field, (cast, required) in spec.items():
+        if not data or field not in data:
+            if required:
+                missing.append(field)
+            continue
+        try:
+            clean[field] = cast(data[field])
+        except (ValueError, TypeError) as e:
+            invalid.append(f"{field}: {e}")
+    return clean, missing, invalid
@@ -0,0 +1,18 @@
+# backend/gunicorn.conf.py
+# Production server tuning. The workload is I/O-bound (every handler
+# waits on Supabase round-trips), so threaded workers keep many requests
+# in flight per process while the GIL is released during network waits.
+import os
+
+bind = "0.0.0.0:8000"
+
+# Standard sizing formula; each worker is a separate process with its own
+# in-memory caches and audit queue.
+workers = 2 * (os.cpu_count() or 1) + 1
+worker_class = "gthread"
+threads = 8
+
+# Keep client connections warm between dashboard polls, and give slow
+# bulk CSV uploads room before the worker is considered hung.
+keepalive = 30
+timeout = 60
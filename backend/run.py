@@ -7,8 +7,11 @@ from app import create_app
 app = create_app()
 
 if __name__ == "__main__":
-    # For local development without Gunicorn (optional)
-    # Use the port you were using locally, e.g., 5001
+    # Local development only. Production runs under Gunicorn with the
+    # threaded worker pool from gunicorn.conf.py (see the Dockerfile);
+    # the Werkzeug dev server handles one request at a time by default,
+    # so even locally enable threading to keep I/O-bound Supabase calls
+    # from queueing behind each other.
     port = int(os.environ.get("PORT", 5001))
     # Note: Use debug=True only in development!
-    app.run(host="0.0.0.0", port=port, debug=False)
+    app.run(host="0.0.0.0", port=port, debug=False, threaded=True)
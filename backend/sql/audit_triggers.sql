@@ -0,0 +1,77 @@
+-- backend/sql/audit_triggers.sql
+-- Transactional audit capture for items and user_roles.
+-- Apply with the Supabase SQL Editor. See README.md in this directory.
+--
+-- Writes that go through the actor-aware RPCs in functions.sql set the
+-- app.audit_user_id transaction setting; the trigger then records the
+-- change inside the same transaction, so the audit row can neither be
+-- lost nor race the mutation, and the backend saves the second
+-- round-trip it used to spend inserting the log entry. Writes without
+-- an actor (e.g. the plain PostgREST insert in add_item, or the bulk
+-- update which logs one summary entry) are skipped here because the
+-- backend still logs those paths itself with the acting user attached.
+
+create or replace function public.audit_fn()
+returns trigger
+language plpgsql
+as $$
+declare
+  v_actor uuid;
+  v_action text;
+  v_old jsonb;
+  v_new jsonb;
+  v_record uuid;
+begin
+  v_actor := nullif(current_setting('app.audit_user_id', true), '')::uuid;
+  if v_actor is null then
+    return null;  -- not an actor-aware RPC write; backend logs it
+  end if;
+
+  if tg_op <> 'INSERT' then v_old := to_jsonb(old); end if;
+  if tg_op <> 'DELETE' then v_new := to_jsonb(new); end if;
+
+  if tg_table_name = 'items' then
+    v_record := coalesce(new.id, old.id);
+    if tg_op = 'INSERT' then
+      v_action := 'CREATE_ITEM';
+    elsif tg_op = 'DELETE' then
+      v_action := 'DELETE_ITEM';
+    elsif (v_new - 'quantity' - 'updated_at') = (v_old - 'quantity' - 'updated_at') then
+      -- Only the quantity changed: keep the action vocabulary the
+      -- backend and the trend reconstruction already use
+      v_action := 'UPDATE_QUANTITY';
+    else
+      v_action := 'UPDATE_ITEM';
+    end if;
+  elsif tg_table_name = 'user_roles' then
+    v_record := coalesce(new.user_id, old.user_id);
+    if tg_op = 'INSERT' then
+      v_action := 'ASSIGN_ROLE';
+    elsif tg_op = 'DELETE' then
+      v_action := 'REMOVE_ROLE';
+    elsif old.role = new.role then
+      return null;  -- no-op upsert (only updated_at bumped)
+    else
+      v_action := 'UPDATE_ROLE';
+    end if;
+  else
+    return null;
+  end if;
+
+  insert into public.audit_logs
+    (user_id, action, table_name, record_id, old_values, new_values, "timestamp")
+  values
+    (v_actor, v_action, tg_table_name, v_record, v_old, v_new, now());
+  return null;
+end;
+$$;
+
+drop trigger if exists audit_items_trg on public.items;
+create trigger audit_items_trg
+  after insert or update or delete on public.items
+  for each row execute function public.audit_fn();
+
+drop trigger if exists audit_user_roles_trg on public.user_roles;
+create trigger audit_user_roles_trg
+  after insert or update or delete on public.user_roles
+  for each row execute function public.audit_fn();
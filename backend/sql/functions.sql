@@ -0,0 +1,347 @@
+-- backend/sql/functions.sql
+-- RPC functions called by the Flask backend via supabase.rpc().
+-- Apply with the Supabase SQL Editor. See README.md in this directory.
+
+-- auth_and_role(jwt): validate a JWT and return the caller's identity and
+-- role in a single round-trip. Replaces the GoTrue get_user call followed
+-- by a separate user_roles select (two sequential RTTs) in the auth path.
+-- Uses pgjwt (ships with Supabase) to verify the signature against the
+-- project's JWT secret, which must be exposed to Postgres via:
+--   alter database postgres set app.settings.jwt_secret = '<jwt secret>';
+-- inventory_totals(): compute the monthly report scalars with Postgres'
+-- aggregate executor instead of shipping every item row to Python just
+-- to sum three numbers.
+create or replace function public.inventory_totals()
+returns table (total_units bigint, total_value numeric, distinct_items bigint)
+language sql
+stable
+as $$
+  select coalesce(sum(quantity), 0)::bigint,
+         coalesce(sum(quantity * price), 0)::numeric,
+         count(*)::bigint
+  from public.items;
+$$;
+
+-- assign_user_role(p_user_id, p_role): upsert a user's role and return the
+-- previous value in the same statement, replacing the backend's existence
+-- check + role select + upsert sequence. Assigning to a user that does not
+-- exist in auth.users raises a foreign-key violation, which the backend
+-- maps to a 404.
+drop function if exists public.assign_user_role(uuid, text);
+create or replace function public.assign_user_role(
+  p_user_id uuid, p_role text, p_actor uuid default null
+)
+returns table (old_role text, new_role text)
+language plpgsql
+as $$
+declare
+  v_old text;
+  v_new public.user_roles.role%type;
+begin
+  -- Attribute this write for the audit trigger (see audit_triggers.sql)
+  perform set_config('app.audit_user_id', coalesce(p_actor::text, ''), true);
+  -- Assignment casts the text argument to the role enum, validating it.
+  v_new := p_role;
+  select r.role::text into v_old
+  from public.user_roles r
+  where r.user_id = p_user_id
+  for update;
+  insert into public.user_roles (user_id, role)
+  values (p_user_id, v_new)
+  on conflict (user_id) do update
+    set role = excluded.role, updated_at = now();
+  return query select v_old, p_role;
+end;
+$$;
+
+-- update_item(p_id, p_fields): apply a partial update and return both the
+-- previous and the updated row in the same round-trip, replacing the
+-- backend's SELECT-then-UPDATE pair. Only keys present in p_fields change.
+drop function if exists public.update_item(uuid, jsonb);
+create or replace function public.update_item(
+  p_id uuid, p_fields jsonb, p_actor uuid default null
+)
+returns table (old_item jsonb, new_item jsonb)
+language plpgsql
+as $$
+declare
+  v_old jsonb;
+  v_new jsonb;
+begin
+  perform set_config('app.audit_user_id', coalesce(p_actor::text, ''), true);
+  select to_jsonb(i.*) into v_old
+  from public.items i where i.id = p_id for update;
+  if v_old is null then
+    return;
+  end if;
+  update public.items set
+    name = coalesce(p_fields->>'name', name),
+    quantity = coalesce((p_fields->>'quantity')::int, quantity),
+    price = coalesce((p_fields->>'price')::numeric, price),
+    category = case when p_fields ? 'category'
+                    then p_fields->>'category' else category end
+  where id = p_id
+  returning to_jsonb(items.*) into v_new;
+  return query select v_old, v_new;
+end;
+$$;
+
+-- update_item_quantity(p_id, p_qty): set an item's quantity and return the
+-- previous value plus the updated row in one trip.
+drop function if exists public.update_item_quantity(uuid, int);
+create or replace function public.update_item_quantity(
+  p_id uuid, p_qty int, p_actor uuid default null
+)
+returns table (old_quantity int, item jsonb)
+language plpgsql
+as $$
+declare
+  v_old int;
+  v_item jsonb;
+begin
+  perform set_config('app.audit_user_id', coalesce(p_actor::text, ''), true);
+  select quantity into v_old
+  from public.items where id = p_id for update;
+  if not found then
+    return;
+  end if;
+  update public.items set quantity = p_qty where id = p_id
+  returning to_jsonb(items.*) into v_item;
+  return query select v_old, v_item;
+end;
+$$;
+
+-- delete_item(p_id): delete an item and hand back the removed row so the
+-- backend can audit old_values without a preceding SELECT. Returns null
+-- if the item did not exist.
+drop function if exists public.delete_item(uuid);
+create or replace function public.delete_item(
+  p_id uuid, p_actor uuid default null
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+  v_row jsonb;
+begin
+  perform set_config('app.audit_user_id', coalesce(p_actor::text, ''), true);
+  delete from public.items
+  where id = p_id
+  returning to_jsonb(items.*) into v_row;
+  return v_row;
+end;
+$$;
+
+-- bulk_update_quantity(payload): apply a whole batch of quantity updates
+-- in one statement. payload is a jsonb array of
+-- {"item_id": uuid, "new_quantity": int} objects. Returns one row per
+-- requested update with the previous quantity and a status, so the
+-- backend can build its per-row success/failure report without issuing
+-- 2 round-trips (SELECT + UPDATE) per CSV row.
+create or replace function public.bulk_update_quantity(payload jsonb)
+returns table (item_id uuid, old_quantity int, new_quantity int, status text)
+language sql
+as $$
+  with req as (
+    select p.item_id, p.new_quantity
+    from jsonb_to_recordset(payload) as p(item_id uuid, new_quantity int)
+  ),
+  prev as (
+    select i.id, i.quantity as old_quantity
+    from public.items i
+    join req r on r.item_id = i.id
+    for update of i
+  ),
+  upd as (
+    update public.items i
+    set quantity = r.new_quantity
+    from req r
+    where i.id = r.item_id
+    returning i.id
+  )
+  select r.item_id,
+         p.old_quantity,
+         r.new_quantity,
+         case when p.id is null then 'not_found' else 'updated' end as status
+  from req r
+  left join prev p on p.id = r.item_id;
+$$;
+
+-- get_users_with_roles(): join auth.users with user_roles server-side.
+-- Replaces supabase.auth.admin.list_users() (which pages through every
+-- auth user) plus a Python-side filter; only users that actually have a
+-- role assigned come over the wire.
+create or replace function public.get_users_with_roles()
+returns table (user_id uuid, email text, role text)
+language sql
+security definer
+set search_path = public
+as $$
+  select r.user_id, u.email::text, r.role::text
+  from public.user_roles r
+  join auth.users u on u.id = r.user_id
+  order by u.email;
+$$;
+
+-- SECURITY DEFINER bypasses RLS and PostgREST exposes public functions
+-- to anon/authenticated by default, so lock execution down to the
+-- backend's service role - otherwise anyone with the anon key could
+-- dump every user's email and role through /rest/v1/rpc.
+revoke execute on function public.get_users_with_roles()
+  from public, anon, authenticated;
+grant execute on function public.get_users_with_roles() to service_role;
+
+create or replace function public.auth_and_role(jwt text)
+returns table (user_id uuid, email text, role text)
+language plpgsql
+security definer
+set search_path = extensions, public
+as $$
+declare
+  claims json;
+begin
+  -- verify() does NOT raise on a bad signature - it returns a row with
+  -- a valid boolean - so filter on it and refuse to read any claim from
+  -- a token that failed verification.
+  select payload::json into claims
+  from verify(jwt, current_setting('app.settings.jwt_secret'))
+  where valid;
+
+  if claims is null then
+    raise exception 'invalid signature';
+  end if;
+
+  if coalesce((claims->>'exp')::numeric, 0) < extract(epoch from now()) then
+    raise exception 'JWT expired';
+  end if;
+
+  return query
+  select (claims->>'sub')::uuid,
+         claims->>'email',
+         r.role::text
+  from public.user_roles r
+  where r.user_id = (claims->>'sub')::uuid
+  union all
+  select (claims->>'sub')::uuid, claims->>'email', null
+  where not exists (
+    select 1 from public.user_roles r2
+    where r2.user_id = (claims->>'sub')::uuid
+  );
+end;
+$$;
+
+-- Same lockdown as get_users_with_roles: SECURITY DEFINER and only ever
+-- called by the backend, so don't leave it world-callable through
+-- PostgREST's default grants.
+revoke execute on function public.auth_and_role(text)
+  from public, anon, authenticated;
+grant execute on function public.auth_and_role(text) to service_role;
+
+-- dashboard_overview(p_threshold): items list, low-stock alerts and
+-- inventory totals in one round-trip. The dashboard used to issue these
+-- as three sequential requests; bundling them into one RPC collapses
+-- three network round-trips into one and reads items once.
+create or replace function public.dashboard_overview(p_threshold int default 10)
+returns jsonb
+language sql
+stable
+as $$
+  select jsonb_build_object(
+    'items', coalesce(
+      (select jsonb_agg(jsonb_build_object(
+           'id', id, 'name', name, 'quantity', quantity,
+           'price', price, 'category', category) order by name)
+       from public.items),
+      '[]'::jsonb),
+    'low_stock', coalesce(
+      (select jsonb_agg(jsonb_build_object(
+           'id', id, 'name', name, 'quantity', quantity,
+           'category', category) order by quantity)
+       from public.items
+       where quantity < p_threshold),
+      '[]'::jsonb),
+    'totals', (select jsonb_build_object(
+        'distinct_items', count(*),
+        'total_units', coalesce(sum(quantity), 0),
+        'total_value', coalesce(sum(quantity * price), 0))
+     from public.items));
+$$;
+
+-- item_trend(p_id): quantity history series for one item, fully
+-- computed in SQL. Prefers item_quantity_history; items whose changes
+-- predate the history table are reconstructed from audit_logs (direct
+-- quantity actions plus a lateral walk of BULK_UPDATE_QUANTITY
+-- payloads), and a freshly created item with no rows anywhere charts
+-- its creation point from the items row. Last write wins per timestamp.
+-- p_since bounds the scan to a time window so a very active item can't
+-- make the query unbounded, and p_granularity ('hour'/'day') collapses
+-- the series to the last value per bucket so dashboards charting long
+-- ranges get a handful of points instead of every change.
+drop function if exists public.item_trend(uuid);
+drop function if exists public.item_trend(uuid, timestamptz);
+create or replace function public.item_trend(
+  p_id uuid,
+  p_since timestamptz default null,
+  p_granularity text default null
+)
+returns jsonb
+language sql
+stable
+as $$
+  with hist as (
+    select ts, quantity
+    from public.item_quantity_history
+    where item_id = p_id
+      and (p_since is null or ts >= p_since)
+  ),
+  audit_points as (
+    -- Legacy reconstruction, only evaluated when no history rows exist
+    select l."timestamp" as ts, (l.new_values->>'quantity')::int as quantity
+    from public.audit_logs l
+    where not exists (select 1 from hist)
+      and l.table_name = 'items'
+      and l.record_id = p_id::text
+      and l.action in ('CREATE_ITEM', 'UPDATE_QUANTITY', 'UPDATE_ITEM')
+      and l.new_values ? 'quantity'
+      and (p_since is null or l."timestamp" >= p_since)
+    union all
+    select l."timestamp", (e.value->>'new_quantity')::int
+    from public.audit_logs l
+    cross join lateral
+      jsonb_array_elements(l.new_values->'updated_items') as e(value)
+    where not exists (select 1 from hist)
+      and l.table_name = 'items'
+      and l.action = 'BULK_UPDATE_QUANTITY'
+      and e.value->>'item_id' = p_id::text
+      and (p_since is null or l."timestamp" >= p_since)
+  ),
+  raw_points as (
+    select distinct on (ts) ts, quantity
+    from (select ts, quantity from hist
+          union all
+          select ts, quantity from audit_points) p
+    where quantity is not null
+    order by ts
+  ),
+  points as (
+    -- Bucketing defaults to microseconds, i.e. the raw series
+    select distinct on (date_trunc(coalesce(p_granularity, 'microseconds'), ts))
+           date_trunc(coalesce(p_granularity, 'microseconds'), ts) as ts,
+           quantity
+    from raw_points
+    order by date_trunc(coalesce(p_granularity, 'microseconds'), ts), ts desc
+  )
+  select case
+    when exists (select 1 from points) then (
+      select jsonb_build_object(
+        'labels', jsonb_agg(ts order by ts),
+        'quantities', jsonb_agg(quantity order by ts))
+      from points)
+    else (
+      select jsonb_build_object(
+        'labels', coalesce(jsonb_agg(created_at), '[]'::jsonb),
+        'quantities', coalesce(jsonb_agg(quantity), '[]'::jsonb))
+      from public.items
+      where id = p_id)
+  end;
+$$;
@@ -0,0 +1,36 @@
+-- backend/sql/indexes.sql
+-- Indexes backing the backend's hot query paths.
+-- Apply with the Supabase SQL Editor. See README.md in this directory.
+
+-- get_items orders by name and returns every column; a covering index
+-- lets Postgres satisfy the sort and projection with an index-only scan
+-- instead of a heap fetch per row.
+create index if not exists items_name_covering_idx
+  on public.items (name)
+  include (id, quantity, price, category);
+
+-- get_audit_logs orders by timestamp DESC with range pagination; without
+-- this the query sorts the whole table per page.
+create index if not exists audit_logs_ts_desc_idx
+  on public.audit_logs ("timestamp" desc);
+
+-- Filtered audit views: leading equality column(s), then the timestamp
+-- range/sort, matching the query shapes in get_audit_logs and the
+-- get_item_trends audit fallback (table_name + record_id + timestamp).
+create index if not exists audit_logs_user_ts_idx
+  on public.audit_logs (user_id, "timestamp" desc);
+
+create index if not exists audit_logs_action_ts_idx
+  on public.audit_logs (action, "timestamp" desc);
+
+create index if not exists audit_logs_table_record_ts_idx
+  on public.audit_logs (table_name, record_id, "timestamp");
+
+-- Low-stock alerts filter items with quantity below a small threshold
+-- (default 10, user-tunable). The partial index keeps only the rows that
+-- can ever match the default alert, so the check is an O(log n) lookup
+-- even when inventory grows large. Covers the columns the alert returns.
+create index if not exists items_low_stock_idx
+  on public.items (quantity)
+  include (id, name, category)
+  where quantity < 100;
@@ -0,0 +1,34 @@
+-- backend/sql/item_quantity_history.sql
+-- Narrow per-change history of item quantities, maintained by a trigger
+-- on items. get_item_trends reads this with one indexed range query
+-- instead of scanning audit_logs and walking JSONB payloads in Python.
+-- Apply with the Supabase SQL Editor. See README.md in this directory.
+
+create table if not exists public.item_quantity_history (
+  item_id uuid not null,
+  ts timestamptz not null default now(),
+  quantity int not null
+);
+
+create index if not exists item_quantity_history_item_ts_idx
+  on public.item_quantity_history (item_id, ts);
+
+-- Record one row per quantity change, whatever write path caused it
+-- (create, update, quantity patch, bulk RPC).
+create or replace function public.record_item_quantity()
+returns trigger
+language plpgsql
+as $$
+begin
+  if tg_op = 'INSERT' or new.quantity is distinct from old.quantity then
+    insert into public.item_quantity_history (item_id, ts, quantity)
+    values (new.id, now(), new.quantity);
+  end if;
+  return new;
+end;
+$$;
+
+drop trigger if exists item_quantity_history_trg on public.items;
+create trigger item_quantity_history_trg
+  after insert or update of quantity on public.items
+  for each row execute function public.record_item_quantity();